@@ -0,0 +1,79 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from security_features import SecurityFeatures
+from metadata_store import AttemptLogStore, JsonMetadataStore, SqliteMetadataStore
+from secure_container import ContainerMetadataStore
+
+STORES = ['json', 'sqlite', 'container', 'json-log', 'sqlite-log']
+
+
+def make_security(store, workdir):
+    if store == 'container':
+        return SecurityFeatures(ContainerMetadataStore())
+    if store.startswith('sqlite'):
+        inner = SqliteMetadataStore(os.path.join(workdir, 'metadata.db'))
+    else:
+        inner = JsonMetadataStore()
+    if store.endswith('-log'):
+        return SecurityFeatures(AttemptLogStore(inner))
+    return SecurityFeatures(inner)
+
+
+def attempt_worker(store, workdir, file_path, attempts):
+    security = make_security(store, workdir)
+    granted = []
+    for _ in range(attempts):
+        allowed, _, message = security.check_security(file_path)
+        if allowed and message.startswith("Attempts left: "):
+            granted.append(int(message.split(": ")[1]))
+    return granted
+
+
+def run(store, workers, attempts):
+    workdir = tempfile.mkdtemp(prefix='attempts-')
+    try:
+        file_path = os.path.join(workdir, 'protected.bin')
+        # Fewer attempts than callers, so the counter runs out mid-run and
+        # the file is deleted while workers are still hammering it.
+        max_attempts = workers * attempts - workers
+        make_security(store, workdir).encrypt_with_security(file_path, b'payload', max_attempts=max_attempts)
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(attempt_worker, store, workdir, file_path, attempts)
+                       for _ in range(workers)]
+            granted = [left for future in futures for left in future.result()]
+        elapsed = time.perf_counter() - start
+
+        # Every grant must have spent a distinct count: a lost update shows
+        # up as a repeated value or as more grants than max_attempts.
+        correct = sorted(granted) == list(range(max_attempts))
+        print(f"{store:>10}  workers={workers:<3} calls={workers * attempts:<6} "
+              f"granted={len(granted)}/{max_attempts}  "
+              f"{'ok' if correct else 'LOST UPDATES'}  "
+              f"{workers * attempts / elapsed:9.0f} attempts/s")
+        return correct
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent check_security stress test")
+    parser.add_argument('--stores', nargs='+', choices=STORES, default=STORES)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--attempts', type=int, default=500, help="calls per worker")
+    args = parser.parse_args()
+
+    ok = True
+    for store in args.stores:
+        for workers in args.workers:
+            ok = run(store, workers, args.attempts) and ok
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import io
 import os
 from skipjack_algorithm import Skipjack
 from rabin_algorithm import RabinCipher
+from hybrid_envelope import HybridEnvelope
 from security_features import SecurityFeatures
+from secure_container import ContainerMetadataStore
 
 class EncryptionWindow:
     def __init__(self, method, parent_window, operation):
@@ -14,8 +17,15 @@ class EncryptionWindow:
         self.window.configure(bg='#000000')
         self.parent = parent_window
         self.method = method
-        self.security = SecurityFeatures()
-        self.algorithm = RabinCipher() if method == "Rabin" else Skipjack()
+        # New files are single-file containers; older ciphertext with .meta
+        # and .fake sidecars is still read through the store's fallback.
+        self.security = SecurityFeatures(ContainerMetadataStore())
+        if method == "Rabin":
+            self.algorithm = RabinCipher()
+        elif method == "Hybrid":
+            self.algorithm = HybridEnvelope()
+        else:
+            self.algorithm = Skipjack()
         self.selected_file = None
 
         self.setup_styles()
@@ -166,6 +176,10 @@ class EncryptionWindow:
             key_hint = ttk.Label(right_frame, text="Enter the public key (n)", 
                                style='Hint.TLabel')
             key_hint.pack(pady=5)
+        elif self.method == "Hybrid":
+            key_hint = ttk.Label(right_frame, text="Enter one or more public keys (n), comma-separated", 
+                               style='Hint.TLabel')
+            key_hint.pack(pady=5)
 
         output_frame = ttk.Frame(right_frame)
         output_frame.pack(fill='x', pady=10)
@@ -304,7 +318,7 @@ class EncryptionWindow:
         key_frame.pack(fill='x', pady=10)
         key_frame.configure(style='Main.TFrame')
 
-        if self.method == "Rabin":
+        if self.method in ("Rabin", "Hybrid"):
             keys_frame = ttk.Frame(key_frame)
             keys_frame.pack(fill='x')
             keys_frame.configure(style='Main.TFrame')
@@ -412,16 +426,26 @@ class EncryptionWindow:
             if self.method == "Rabin":
                 try:
                     public_key = int(self.key_input.get().strip())
-                    encrypted = self.algorithm.encrypt(text, public_key)
+                    encrypted = self.algorithm.encrypt_binary(text, public_key)
+                except ValueError:
+                    messagebox.showerror("Error", "Invalid public key")
+                    return
+            elif self.method == "Hybrid":
+                try:
+                    public_keys = [int(n) for n in self.key_input.get().split(',') if n.strip()]
                 except ValueError:
                     messagebox.showerror("Error", "Invalid public key")
                     return
+                if not public_keys:
+                    messagebox.showerror("Error", "Please enter at least one public key")
+                    return
+                encrypted = self.algorithm.seal(text, public_keys)
             else:
                 key = self.key_input.get().strip()
                 if not key:
                     messagebox.showerror("Error", "Please enter a key")
                     return
-                encrypted = self.algorithm.encrypt(text, key)
+                encrypted = Skipjack.pack(self.algorithm.encrypt_bytes(text.encode(), key))
 
             self.security.encrypt_with_security(
                 self.selected_file,
@@ -445,7 +469,7 @@ class EncryptionWindow:
                 return
 
             password = None
-            if self.method == "Rabin":
+            if self.method in ("Rabin", "Hybrid"):
                 try:
                     p = int(self.p_input.get().strip())
                     q = int(self.q_input.get().strip())
@@ -473,22 +497,26 @@ class EncryptionWindow:
                 messagebox.showerror("Error", message)
                 return
 
-            file_to_read = self.selected_file + '.fake' if is_fake else self.selected_file
-            print(f"Reading from file: {file_to_read}")  # Debug log
-
             try:
-                with open(file_to_read, 'r') as f:
-                    encrypted_text = f.read().strip()
-                
-                print(f"Read encrypted text (first 50 chars): {encrypted_text[:50]}...")  # Debug log
-
                 if self.method == "Rabin":
-                    decrypted = self.algorithm.decrypt(encrypted_text, p, q)
+                    with self.security.open_payload(self.selected_file, is_fake) as f:
+                        ciphertext = f.read()
+                    decrypted = self.algorithm.decrypt(ciphertext, p, q)
+                elif self.method == "Hybrid":
+                    with self.security.open_payload(self.selected_file, is_fake) as f:
+                        content = f.read()
+                    decrypted = content.strip().decode('latin-1') if is_fake else self.algorithm.open(content, p, q)
                 else:
                     print("Calling Skipjack decrypt...")  # Debug log
                     if is_fake:
-                        encrypted_text = self.algorithm.encrypt(encrypted_text, key)
-                    decrypted = self.algorithm.decrypt(encrypted_text, key)
+                        with self.security.open_payload(self.selected_file, is_fake) as f:
+                            ciphertext = self.algorithm.encrypt_bytes(f.read().strip(), key)
+                        decrypted = self.algorithm.decrypt_bytes(ciphertext, key).decode('latin-1')
+                    else:
+                        plaintext = io.BytesIO()
+                        with self.security.open_payload(self.selected_file, is_fake) as f:
+                            self.algorithm.decrypt_stream(f, plaintext, key)
+                        decrypted = plaintext.getvalue().decode('latin-1')
                     print(f"Decryption successful, result length: {len(decrypted)}")  # Debug log
 
                 self.result_text.delete("1.0", tk.END)
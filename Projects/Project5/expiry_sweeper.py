@@ -0,0 +1,140 @@
+import argparse
+import heapq
+import threading
+import time
+from security_features import SecurityFeatures
+from metadata_store import SqliteMetadataStore
+from secure_container import ContainerMetadataStore
+
+SWEEP_BATCH_SIZE = 512
+
+
+class ExpirySweeper:
+    # Deletes expired files as their deadlines pass instead of waiting for the
+    # next check_security call. Deadlines sit in a min-heap, so scheduling is
+    # O(log n) and the thread only wakes when the earliest one is due.
+    def __init__(self, security, batch_size=SWEEP_BATCH_SIZE):
+        self.security = security
+        self.batch_size = batch_size
+        self.deleted = 0
+        self._heap = []
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        security.sweeper = self
+
+    def scan(self, root=None):
+        # Bulk load: heapify once instead of pushing entry by entry.
+        entries = list(self.security.store.iter_expiry(root))
+        with self._cond:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(entries)
+
+    def schedule(self, file_path, expiry_time):
+        with self._cond:
+            heapq.heappush(self._heap, (expiry_time, file_path))
+            if self._heap[0][1] == file_path:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def next_deadline(self):
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sweep(self, now=None):
+        # Delete everything due at `now`; returns how many files went.
+        now = time.time() if now is None else now
+        removed = 0
+        while True:
+            batch = self._pop_due(now)
+            if not batch:
+                return removed
+            removed += self._expire(batch, now)
+
+    def _pop_due(self, now):
+        batch = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._heap)[1])
+        return batch
+
+    def _expire(self, batch, now):
+        removed = 0
+        for file_path in batch:
+            # The entry may be stale: file already gone, or re-encrypted with
+            # a later deadline, which then goes back on the heap.
+            metadata = self.security.store.load(file_path)
+            if metadata is None or not metadata.get('expiry_time'):
+                continue
+            if metadata['expiry_time'] > now:
+                self.schedule(file_path, metadata['expiry_time'])
+                continue
+            self.security._delete_files(file_path)
+            removed += 1
+        self.deleted += removed
+        return removed
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.time()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+            self.sweep()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete protected files as soon as they expire")
+    parser.add_argument('roots', nargs='*',
+                        help="directory trees to scan for containers and .meta files")
+    parser.add_argument('--database', help="use this SQLite metadata store instead of scanning files")
+    args = parser.parse_args()
+
+    # Containers are what the app writes; the container store also picks up
+    # older files protected with .meta sidecars.
+    store = SqliteMetadataStore(args.database) if args.database else ContainerMetadataStore()
+    sweeper = ExpirySweeper(SecurityFeatures(store))
+    start = time.perf_counter()
+    for root in args.roots or [None]:
+        if root is None and args.database is None:
+            parser.error("a directory is required without --database")
+        sweeper.scan(root)
+    print(f"scheduled {sweeper.pending()} deadlines in {time.perf_counter() - start:.2f} s")
+
+    sweeper.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sweeper.stop()
+        print(f"deleted {sweeper.deleted} expired files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import io
+import struct
+from rabin_algorithm import RabinCipher
+from skipjack_algorithm import Skipjack
+
+# Envelope layout: header, one slot per recipient, then the Skipjack
+# ciphertext of the payload. A slot is the key fingerprint and length, a
+# Rabin-KEM token, and the session key XORed with the key it encapsulates.
+ENVELOPE_MAGIC = b"HYB2"
+ENVELOPE_HEADER = struct.Struct('>4sH')
+SLOT_HEADER = struct.Struct('>8sI')
+
+
+class HybridEnvelope:
+    @staticmethod
+    def key_fingerprint(public_key):
+        n = public_key
+        return hashlib.sha256(n.to_bytes((n.bit_length() + 7) // 8, 'big')).digest()[:8]
+
+    @staticmethod
+    def seal(message, public_keys):
+        if isinstance(message, str):
+            message = message.encode()
+        out = io.BytesIO()
+        HybridEnvelope.seal_stream(io.BytesIO(message), out, public_keys)
+        return out.getvalue()
+
+    @staticmethod
+    def open(envelope, p, q):
+        out = io.BytesIO()
+        HybridEnvelope.open_stream(io.BytesIO(envelope), out, p, q)
+        return out.getvalue().decode('latin-1')
+
+    @staticmethod
+    def seal_stream(reader, writer, public_keys):
+        if isinstance(public_keys, int):
+            public_keys = [public_keys]
+        if not public_keys:
+            raise ValueError("At least one recipient public key is required")
+
+        session_key = Skipjack.generate_session_key()
+        writer.write(ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, len(public_keys)))
+        for n in public_keys:
+            # A fresh encapsulation per recipient: the same session key under
+            # plain Rabin gives slots that CRT-combine into its square.
+            kek, token = RabinCipher.encapsulate(n, len(session_key))
+            wrapped = HybridEnvelope._xor(session_key.encode(), kek)
+            writer.write(SLOT_HEADER.pack(HybridEnvelope.key_fingerprint(n), len(token) + len(wrapped)))
+            writer.write(token + wrapped)
+        return Skipjack().encrypt_stream(reader, writer, session_key)
+
+    @staticmethod
+    def open_stream(reader, writer, p, q):
+        session_key = HybridEnvelope._unwrap_session_key(reader, p, q)
+        return Skipjack().decrypt_stream(reader, writer, session_key)
+
+    @staticmethod
+    def _unwrap_session_key(reader, p, q):
+        header = reader.read(ENVELOPE_HEADER.size)
+        if len(header) < ENVELOPE_HEADER.size:
+            raise ValueError("Not a hybrid envelope")
+        magic, count = ENVELOPE_HEADER.unpack(header)
+        if magic != ENVELOPE_MAGIC:
+            raise ValueError("Not a hybrid envelope")
+
+        fingerprint = HybridEnvelope.key_fingerprint(p * q)
+        session_key = None
+        for _ in range(count):
+            slot = reader.read(SLOT_HEADER.size)
+            if len(slot) < SLOT_HEADER.size:
+                raise ValueError("Truncated hybrid envelope")
+            slot_fingerprint, length = SLOT_HEADER.unpack(slot)
+            body = reader.read(length)
+            if len(body) < length:
+                raise ValueError("Truncated hybrid envelope")
+            if slot_fingerprint == fingerprint:
+                width = RabinCipher.token_width(p * q)
+                if length <= width:
+                    raise ValueError("Truncated hybrid envelope")
+                kek = RabinCipher.decapsulate(body[:width], p, q, length - width)
+                session_key = HybridEnvelope._xor(body[width:], kek)
+
+        if session_key is None:
+            raise ValueError("Envelope is not addressed to this key")
+        if not session_key.isascii() or not session_key.isalnum():
+            raise ValueError("Failed to unwrap the session key")
+        return session_key.decode()
+
+    @staticmethod
+    def _xor(data, mask):
+        return bytes(a ^ b for a, b in zip(data, mask))
+
+    @staticmethod
+    def get_key_type():
+        return "hybrid"
@@ -0,0 +1,33 @@
+import argparse
+import statistics
+from password_kdf import DEFAULT_TARGET_SECONDS, PasswordKdf
+
+
+def describe(params):
+    if params['algorithm'] == 'scrypt':
+        return f"scrypt n=2**{params['n'].bit_length() - 1} r={params['r']} p={params['p']}"
+    return f"pbkdf2_sha256 iterations={params['iterations']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password KDF cost versus latency")
+    parser.add_argument('--algorithms', nargs='+', choices=['scrypt', 'pbkdf2_sha256'],
+                        default=[PasswordKdf.default_algorithm()])
+    parser.add_argument('--target', type=float, default=DEFAULT_TARGET_SECONDS,
+                        help="target latency in seconds for calibration")
+    parser.add_argument('--runs', type=int, default=3, help="derivations per cost step")
+    args = parser.parse_args()
+
+    for algorithm in args.algorithms:
+        for params in PasswordKdf.cost_steps(algorithm):
+            timings = [PasswordKdf.time_params(params) for _ in range(args.runs)]
+            median = statistics.median(timings)
+            print(f"{describe(params):<36} {median * 1000:9.1f} ms")
+            if median > 4 * args.target:
+                break
+        chosen = PasswordKdf.calibrate(args.target, algorithm)
+        print(f"calibrated for {args.target * 1000:.0f} ms: {describe(chosen)}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import statistics
+import time
+from rabin_algorithm import RabinCipher
+
+
+def measure(bits, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        RabinCipher.generate_keys(bits)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(bits, timings):
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    print(f"{bits:>6} bits  runs={len(timings):<4} "
+          f"p50={cuts[49] * 1000:9.1f} ms  p90={cuts[89] * 1000:9.1f} ms  "
+          f"p99={cuts[98] * 1000:9.1f} ms  max={max(timings) * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rabin key generation latency")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 2048, 3072, 4096],
+                        help="modulus sizes in bits")
+    parser.add_argument('--runs', type=int, default=20, help="key pairs per size")
+    args = parser.parse_args()
+    if args.runs < 2:
+        parser.error("--runs must be at least 2 to compute percentiles")
+
+    print(f"arithmetic backend: {RabinCipher.arithmetic_backend()}")
+    for bits in args.sizes:
+        report(bits, measure(bits, args.runs))
+
+
+if __name__ == "__main__":
+    main()
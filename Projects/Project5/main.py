@@ -222,7 +222,7 @@ class MainMenu:
             self.algorithm_var = tk.StringVar(value="Skipjack")
             algorithm_combo = ttk.Combobox(algorithm_frame,
                                          textvariable=self.algorithm_var,
-                                         values=["Rabin", "Skipjack"],
+                                         values=["Rabin", "Skipjack", "Hybrid"],
                                          state='readonly',
                                          style='TCombobox',
                                          font=('Consolas', 11),
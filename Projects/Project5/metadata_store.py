@@ -0,0 +1,368 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+METADATA_FIELDS = ('created_at', 'attempts_left', 'expiry_time',
+                   'fake_password_hash', 'has_fake_content')
+DEFAULT_DATABASE = "security_metadata.db"
+IMPORT_BATCH_SIZE = 5000
+SQLITE_BUSY_TIMEOUT = 30.0
+# One attempt-log record: timestamp and pid of the process that made it.
+ATTEMPT_RECORD = struct.Struct('>dI')
+ATTEMPT_LOG_COMPACT_RECORDS = 256
+
+# Stands in for flock where fcntl is unavailable; only covers this process.
+# Reentrant because stores nest, e.g. an attempt log over a container.
+_local_lock = threading.RLock()
+
+
+@contextmanager
+def file_lock(f, exclusive=True):
+    # flock on an open file or descriptor.
+    if fcntl is None:
+        with _local_lock:
+            yield
+        return
+    fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def locked_file(path, mode, exclusive=True):
+    # Open and lock path for a read-modify-write. A writer that held the
+    # lock before us may have renamed a new file into place; our lock is
+    # then on the old inode, so open again.
+    while True:
+        with open(path, mode) as f:
+            with file_lock(f, exclusive):
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    yield f
+                    return
+
+
+def atomic_write(path, data, fsync=False):
+    # Write beside the target and rename over it, so readers only ever see
+    # a complete file.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb' if isinstance(data, (bytes, bytearray)) else 'w') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def expiry_entries(items):
+    # (expiry_time, file_path) for the (file_path, metadata) pairs that expire.
+    for file_path, metadata in items:
+        if metadata.get('expiry_time'):
+            yield metadata['expiry_time'], file_path
+
+
+class JsonMetadataStore:
+    # The original layout: one <file>.meta JSON document next to each file.
+    def __init__(self, extension=".meta"):
+        self.extension = extension
+
+    def load(self, file_path):
+        try:
+            with open(file_path + self.extension, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, file_path, metadata):
+        atomic_write(file_path + self.extension, json.dumps(metadata))
+
+    def decrement_attempts(self, file_path):
+        # Atomically take one attempt. Returns the metadata as it was before
+        # the decrement, or None if there is none.
+        meta_path = file_path + self.extension
+        try:
+            with locked_file(meta_path, 'r') as f:
+                metadata = json.load(f)
+                if (metadata.get('attempts_left') or 0) > 0:
+                    self.save(file_path, dict(metadata, attempts_left=metadata['attempts_left'] - 1))
+                return metadata
+        except FileNotFoundError:
+            return None
+
+    def delete(self, file_path):
+        try:
+            os.remove(file_path + self.extension)
+        except FileNotFoundError:
+            pass
+
+    def iter_metadata(self, root):
+        for meta_path in iter_meta_files(root, self.extension):
+            try:
+                with open(meta_path, 'r') as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            yield meta_path[:-len(self.extension)], metadata
+
+    def iter_expiry(self, root):
+        return expiry_entries(self.iter_metadata(root))
+
+
+class SqliteMetadataStore:
+    # All metadata in one database, keyed by absolute path, with an index on
+    # expiry_time so expired entries can be found without a table scan.
+    def __init__(self, database=DEFAULT_DATABASE):
+        self.database = database
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database, timeout=SQLITE_BUSY_TIMEOUT,
+                                     check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " path TEXT PRIMARY KEY,"
+                " created_at REAL,"
+                " attempts_left INTEGER,"
+                " expiry_time REAL,"
+                " fake_password_hash TEXT,"
+                " has_fake_content INTEGER)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_expiry ON metadata (expiry_time)"
+                " WHERE expiry_time IS NOT NULL")
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    @staticmethod
+    def _row(file_path, metadata):
+        return (SqliteMetadataStore._key(file_path),
+                metadata.get('created_at'),
+                metadata.get('attempts_left'),
+                metadata.get('expiry_time'),
+                metadata.get('fake_password_hash'),
+                int(bool(metadata.get('has_fake_content'))))
+
+    def load(self, file_path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, attempts_left, expiry_time, fake_password_hash,"
+                " has_fake_content FROM metadata WHERE path = ?",
+                (self._key(file_path),)).fetchone()
+        if row is None:
+            return None
+        metadata = dict(zip(METADATA_FIELDS, row))
+        metadata['has_fake_content'] = bool(metadata['has_fake_content'])
+        return metadata
+
+    def save(self, file_path, metadata):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                self._row(file_path, metadata))
+
+    def decrement_attempts(self, file_path):
+        # Compare-and-swap on attempts_left: the update only lands if nobody
+        # else changed the counter since we read it, otherwise re-read.
+        key = self._key(file_path)
+        while True:
+            metadata = self.load(file_path)
+            if metadata is None or (metadata['attempts_left'] or 0) <= 0:
+                return metadata
+            with self._lock, self._conn:
+                updated = self._conn.execute(
+                    "UPDATE metadata SET attempts_left = attempts_left - 1"
+                    " WHERE path = ? AND attempts_left = ?",
+                    (key, metadata['attempts_left'])).rowcount
+            if updated:
+                return metadata
+
+    def delete(self, file_path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM metadata WHERE path = ?",
+                               (self._key(file_path),))
+
+    def iter_expiry(self, root=None):
+        # Served from the expiry index; root narrows it to one directory tree.
+        query = "SELECT expiry_time, path FROM metadata WHERE expiry_time IS NOT NULL"
+        params = ()
+        if root is not None:
+            prefix = os.path.join(os.path.abspath(root), '')
+            query += " AND substr(path, 1, ?) = ?"
+            params = (len(prefix), prefix)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return iter(rows)
+
+    def import_many(self, items):
+        # items: (file_path, metadata) pairs, written in large transactions.
+        count = 0
+        batch = []
+        for file_path, metadata in items:
+            batch.append(self._row(file_path, metadata))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                count += self._insert_batch(batch)
+                batch = []
+        if batch:
+            count += self._insert_batch(batch)
+        return count
+
+    def _insert_batch(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def import_meta_files(self, root, extension=".meta", remove=False):
+        source = JsonMetadataStore(extension)
+        items = list(source.iter_metadata(root))
+        count = self.import_many(items)
+        if remove:
+            for file_path, _ in items:
+                source.delete(file_path)
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AttemptLogStore:
+    # Wraps another store so that spending an attempt is one fixed-size
+    # append to <file>.attempts instead of a metadata rewrite. The remaining
+    # count is the stored base minus the number of log records; compact()
+    # folds the log back into the base.
+    #
+    # Appends use O_APPEND, so each lands at a distinct offset and that
+    # offset is the attempt's sequence number. Appenders hold a shared flock
+    # and compaction an exclusive one, so base and log are always read as a
+    # consistent pair.
+    def __init__(self, inner, extension=".attempts", compact_records=ATTEMPT_LOG_COMPACT_RECORDS):
+        self.inner = inner
+        self.extension = extension
+        self.compact_records = compact_records
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def load(self, file_path):
+        try:
+            fd = os.open(file_path + self.extension, os.O_RDONLY)
+        except FileNotFoundError:
+            return self.inner.load(file_path)
+        try:
+            with file_lock(fd, False):
+                metadata = self.inner.load(file_path)
+                spent = os.fstat(fd).st_size // ATTEMPT_RECORD.size
+        finally:
+            os.close(fd)
+        if metadata is not None and spent and (metadata.get('attempts_left') or 0) > 0:
+            # Never below 0: -1 means unlimited.
+            metadata['attempts_left'] = max(metadata['attempts_left'] - spent, 0)
+        return metadata
+
+    def save(self, file_path, metadata):
+        self.inner.save(file_path, metadata)
+        self._clear_log(file_path)
+
+    @property
+    def write_container(self):
+        # Only present when the inner store writes containers; a fresh
+        # container starts a fresh log, as save() does.
+        inner_write = self.inner.write_container
+
+        def write_container(file_path, payload, metadata, decoy=b''):
+            inner_write(file_path, payload, metadata, decoy)
+            self._clear_log(file_path)
+        return write_container
+
+    def _clear_log(self, file_path):
+        try:
+            os.truncate(file_path + self.extension, 0)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, file_path):
+        self.inner.delete(file_path)
+        try:
+            os.remove(file_path + self.extension)
+        except FileNotFoundError:
+            pass
+
+    def decrement_attempts(self, file_path):
+        log_path = file_path + self.extension
+        try:
+            fd = os.open(log_path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            if self.inner.load(file_path) is None:
+                return None
+            fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+        try:
+            with file_lock(fd, False):
+                metadata = self.inner.load(file_path)
+                if metadata is None or (metadata.get('attempts_left') or 0) <= 0:
+                    return metadata
+                # Once the log has used up the base, stop appending.
+                if os.fstat(fd).st_size // ATTEMPT_RECORD.size >= metadata['attempts_left']:
+                    metadata['attempts_left'] = 0
+                    return metadata
+                os.write(fd, ATTEMPT_RECORD.pack(time.time(), os.getpid()))
+                # Records before ours, i.e. attempts already spent. Racing
+                # appenders can still overshoot the base by a record or two.
+                spent = os.lseek(fd, 0, os.SEEK_CUR) // ATTEMPT_RECORD.size - 1
+        finally:
+            os.close(fd)
+
+        metadata['attempts_left'] = max(metadata['attempts_left'] - spent, 0)
+        if spent + 1 >= self.compact_records:
+            self.compact(file_path)
+        return metadata
+
+    def compact(self, file_path):
+        # A crash between the save and the truncate counts those attempts
+        # twice, which only ever errs towards fewer attempts.
+        try:
+            fd = os.open(file_path + self.extension, os.O_RDWR)
+        except FileNotFoundError:
+            return 0
+        try:
+            with file_lock(fd, True):
+                spent = os.fstat(fd).st_size // ATTEMPT_RECORD.size
+                if spent:
+                    metadata = self.inner.load(file_path)
+                    if metadata is not None:
+                        metadata['attempts_left'] = max(metadata['attempts_left'] - spent, 0)
+                        self.inner.save(file_path, metadata)
+                    os.ftruncate(fd, 0)
+        finally:
+            os.close(fd)
+        return spent
+
+
+def iter_meta_files(root, extension=".meta"):
+    # os.scandir instead of os.walk: one directory read per level and no
+    # extra stat calls for plain files.
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(extension) and entry.is_file():
+                    # Regular files only: opening a FIFO would block.
+                    yield entry.path
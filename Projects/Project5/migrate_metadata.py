@@ -0,0 +1,27 @@
+import argparse
+import time
+from metadata_store import DEFAULT_DATABASE, SqliteMetadataStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import .meta files into the SQLite metadata store")
+    parser.add_argument('roots', nargs='+', help="directories to scan for .meta files")
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help="SQLite database path")
+    parser.add_argument('--extension', default=".meta", help="metadata file extension")
+    parser.add_argument('--remove', action='store_true',
+                        help="delete each .meta file once it has been imported")
+    args = parser.parse_args()
+
+    store = SqliteMetadataStore(args.database)
+    start = time.perf_counter()
+    total = 0
+    for root in args.roots:
+        count = store.import_meta_files(root, args.extension, args.remove)
+        print(f"{root}: imported {count} entries")
+        total += count
+    store.close()
+    print(f"{total} entries in {time.perf_counter() - start:.2f} s -> {args.database}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TARGET_SECONDS = 0.1
+SALT_BYTES = 16
+KEY_BYTES = 32
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MIN_LOG_N = 10
+SCRYPT_MAX_LOG_N = 17
+PBKDF2_MIN_ITERATIONS = 10_000
+PBKDF2_MAX_ITERATIONS = 10_000_000
+VERIFIED_CACHE_SIZE = 128
+
+
+class PasswordKdf:
+    # Salted, tunable-cost password hashing. Each hash is stored as one
+    # self-describing string,
+    #     scrypt$<n>$<r>$<p>$<salt hex>$<key hex>
+    #     pbkdf2_sha256$<iterations>$<salt hex>$<key hex>
+    # so the parameters travel with the metadata and any store can hold it.
+    # Bare hex digests from the old unsalted SHA-256 still verify.
+    _calibrated = {}
+    _calibration_lock = threading.Lock()
+
+    def __init__(self, params=None, target_seconds=DEFAULT_TARGET_SECONDS,
+                 cache_size=VERIFIED_CACHE_SIZE):
+        self._params = params
+        self.target_seconds = target_seconds
+        self.cache_size = cache_size
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def params(self):
+        # Calibrated on first use and shared per process, so opening several
+        # windows does not re-run the calibration.
+        if self._params is None:
+            with PasswordKdf._calibration_lock:
+                params = PasswordKdf._calibrated.get(self.target_seconds)
+                if params is None:
+                    params = PasswordKdf.calibrate(self.target_seconds)
+                    PasswordKdf._calibrated[self.target_seconds] = params
+            self._params = params
+        return self._params
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        params = self.params
+        key = PasswordKdf.derive(password, salt, params)
+        return PasswordKdf.encode(params, salt, key)
+
+    def verify(self, password, encoded):
+        # Only successful checks are cached; a wrong guess always pays the
+        # full derivation.
+        token = hashlib.sha256(f"{encoded}\0{password}".encode()).digest()
+        with self._lock:
+            if token in self._verified:
+                self._verified.move_to_end(token)
+                self.hits += 1
+                return True
+            self.misses += 1
+
+        if '$' not in encoded:
+            expected = bytes.fromhex(encoded)
+            actual = hashlib.sha256(password.encode()).digest()
+        else:
+            params, salt, expected = PasswordKdf.decode(encoded)
+            actual = PasswordKdf.derive(password, salt, params)
+        if not hmac.compare_digest(actual, expected):
+            return False
+
+        with self._lock:
+            self._verified[token] = True
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return True
+
+    def cache_info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._verified), 'max_size': self.cache_size}
+
+    @staticmethod
+    def derive(password, salt, params):
+        if isinstance(password, str):
+            password = password.encode()
+        if params['algorithm'] == 'scrypt':
+            n, r, p = params['n'], params['r'], params['p']
+            return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r + (1 << 20), dklen=KEY_BYTES)
+        if params['algorithm'] == 'pbkdf2_sha256':
+            return hashlib.pbkdf2_hmac('sha256', password, salt, params['iterations'], KEY_BYTES)
+        raise ValueError(f"Unknown password KDF: {params['algorithm']}")
+
+    @staticmethod
+    def encode(params, salt, key):
+        if params['algorithm'] == 'scrypt':
+            fields = [params['algorithm'], params['n'], params['r'], params['p']]
+        else:
+            fields = [params['algorithm'], params['iterations']]
+        return '$'.join(str(field) for field in fields + [salt.hex(), key.hex()])
+
+    @staticmethod
+    def decode(encoded):
+        fields = encoded.split('$')
+        try:
+            if fields[0] == 'scrypt' and len(fields) == 6:
+                params = {'algorithm': 'scrypt', 'n': int(fields[1]),
+                          'r': int(fields[2]), 'p': int(fields[3])}
+            elif fields[0] == 'pbkdf2_sha256' and len(fields) == 4:
+                params = {'algorithm': 'pbkdf2_sha256', 'iterations': int(fields[1])}
+            else:
+                raise ValueError(f"Unknown password hash format: {fields[0]}")
+            return params, bytes.fromhex(fields[-2]), bytes.fromhex(fields[-1])
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"Invalid password hash: {str(e)}")
+
+    @staticmethod
+    def default_algorithm():
+        return 'scrypt' if hasattr(hashlib, 'scrypt') else 'pbkdf2_sha256'
+
+    @staticmethod
+    def cost_steps(algorithm):
+        if algorithm == 'scrypt':
+            for log_n in range(SCRYPT_MIN_LOG_N, SCRYPT_MAX_LOG_N + 1):
+                yield {'algorithm': 'scrypt', 'n': 1 << log_n, 'r': SCRYPT_R, 'p': SCRYPT_P}
+        else:
+            iterations = PBKDF2_MIN_ITERATIONS
+            while iterations <= PBKDF2_MAX_ITERATIONS:
+                yield {'algorithm': 'pbkdf2_sha256', 'iterations': iterations}
+                iterations *= 2
+
+    @staticmethod
+    def time_params(params, salt=b'\0' * SALT_BYTES):
+        start = time.perf_counter()
+        PasswordKdf.derive(b'calibration', salt, params)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def calibrate(target_seconds=DEFAULT_TARGET_SECONDS, algorithm=None):
+        # Cheapest cost that reaches the target latency on this machine;
+        # each step doubles the work, so this takes about 2x the target.
+        params = None
+        for params in PasswordKdf.cost_steps(algorithm or PasswordKdf.default_algorithm()):
+            if PasswordKdf.time_params(params) >= target_seconds:
+                break
+        return params
@@ -1,18 +1,92 @@
-import random
 import math
 import base64
+import hashlib
+import os
+import secrets
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+# Block-mode ciphertext starts with this prefix; anything else is the legacy
+# one-base64-character-per-chunk format. Each block is written as
+# c * 4 + hint, where the two hint bits pick the right square root. The
+# message is padded with random bytes and a trailing length field, so the
+# last block is as wide as the others, and every block is masked OAEP-style
+# under a fresh random seed before it is squared.
+BLOCK_PREFIX = "rb4:"
+# Binary container: header, then one fixed-width big-endian token per block.
+BINARY_MAGIC = b"RBN2"
+BINARY_VERSION = 3
+BINARY_HEADER = struct.Struct('>4sBH')
+BASE64_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='
+
+DEFAULT_KEY_BITS = 2048
+MIN_KEY_BITS = 32
+MILLER_RABIN_ROUNDS = 40
+SIEVE_PRIME_LIMIT = 1 << 16
+SIEVE_WINDOW = 1 << 13
+PRIVATE_KEY_CACHE_SIZE = 32
+STREAM_CHUNK_SIZE = 1 << 16
+PARALLEL_BATCH_SIZE = 256
+NUMPY_MAX_MODULUS_BITS = 31
+NUMPY_MIN_BLOCKS = 64
+MASK_SEED_SIZE = 32
+
+_BASE64_BYTES = frozenset(BASE64_ALPHABET.encode('ascii'))
+
+# Big-integer backend, fixed at import: GMP through gmpy2 when it is
+# installed, built-in int otherwise. Results are always plain ints.
+if gmpy2 is not None:
+    ARITHMETIC_BACKEND = "gmpy2"
+
+    def _powmod(base, exponent, modulus):
+        return int(gmpy2.powmod(base, exponent, modulus))
+
+    def _invert(a, modulus):
+        return int(gmpy2.invert(a, modulus))
+else:
+    ARITHMETIC_BACKEND = "int"
+
+    def _powmod(base, exponent, modulus):
+        return pow(base, exponent, modulus)
+
+    def _invert(a, modulus):
+        return pow(a, -1, modulus)
+
+
+def _small_primes(limit):
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, math.isqrt(limit) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit + 1, i)))
+    return [i for i in range(limit + 1) if sieve[i]]
+
+
+# Odd small primes with the inverse of 4 modulo each, for the candidate
+# sieve in _generate_blum_prime.
+_SIEVE_PRIMES = [(sp, pow(4, -1, sp)) for sp in _small_primes(SIEVE_PRIME_LIMIT)[1:]]
 
 class RabinCipher:
     @staticmethod
-    def generate_keys():
-        def get_prime():
-            while True:
-                p = random.randint(300, 400)
-                if p % 4 == 3 and all(p % i != 0 for i in range(2, int(math.sqrt(p)) + 1)):
-                    return p
-        
-        p = get_prime()
-        q = get_prime()
+    def generate_keys(bits=DEFAULT_KEY_BITS):
+        if bits < MIN_KEY_BITS:
+            raise ValueError(f"Key size must be at least {MIN_KEY_BITS} bits")
+
+        p = RabinCipher._generate_blum_prime(bits // 2)
+        q = p
+        while q == p:
+            q = RabinCipher._generate_blum_prime(bits - bits // 2)
         n = p * q
         return {
             'public_key': n,
@@ -20,10 +94,89 @@ class RabinCipher:
         }
 
     @staticmethod
-    def encrypt(message, public_key):
+    def _generate_blum_prime(bits):
+        rounds = RabinCipher._miller_rabin_rounds(bits)
+        while True:
+            # Top two bits set so p * q has exactly the requested size, and
+            # p = 3 (mod 4) so square roots need a single exponentiation.
+            base = secrets.randbits(bits) | (3 << (bits - 2)) | 3
+
+            # Sieve the window base, base + 4, base + 8, ... against every
+            # small prime at once, so Miller-Rabin only sees survivors.
+            window = bytearray([1]) * SIEVE_WINDOW
+            for sp, inv4 in _SIEVE_PRIMES:
+                if sp >= base:
+                    break
+                start = (-base * inv4) % sp
+                window[start::sp] = bytes(len(range(start, SIEVE_WINDOW, sp)))
+
+            for i in range(SIEVE_WINDOW):
+                if not window[i]:
+                    continue
+                candidate = base + 4 * i
+                if candidate.bit_length() != bits:
+                    break
+                if RabinCipher._is_probable_prime(candidate, rounds):
+                    return candidate
+
+    @staticmethod
+    def _miller_rabin_rounds(bits):
+        # Rounds giving error below 2**-100 for random candidates
+        # (FIPS 186-4, appendix C.3); small sizes are cheap, so be generous.
+        if bits >= 1536:
+            return 4
+        if bits >= 1024:
+            return 5
+        if bits >= 512:
+            return 7
+        return MILLER_RABIN_ROUNDS
+
+    @staticmethod
+    def _is_probable_prime(n, rounds=MILLER_RABIN_ROUNDS):
+        for sp, _ in _SIEVE_PRIMES:
+            if n % sp == 0:
+                return n == sp
+            if sp > 50:
+                break
+        if gmpy2 is not None:
+            return bool(gmpy2.is_prime(n, rounds))
+
+        d = n - 1
+        s = 0
+        while d % 2 == 0:
+            d //= 2
+            s += 1
+
+        for _ in range(rounds):
+            a = secrets.randbelow(n - 3) + 2
+            x = _powmod(a, d, n)
+            if x == 1 or x == n - 1:
+                continue
+            for _ in range(s - 1):
+                x = (x * x) % n
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def encrypt(message, public_key, mode="auto"):
         try:
             n = public_key
+            if mode == "auto":
+                mode = "block" if RabinCipher.block_size(n) > 0 else "legacy"
+            if mode == "block":
+                blocks = RabinCipher._encrypt_blocks(message.encode(), n)
+                return BLOCK_PREFIX + ','.join(str(c) for c in blocks)
+            if mode != "legacy":
+                raise ValueError(f"Unknown mode: {mode}")
+
             message_b64 = base64.b64encode(message.encode()).decode()
+            codebook = RabinCipher.legacy_codebook(n)
+            if codebook is not None:
+                return ','.join([codebook[chunk] for chunk in message_b64])
+
             chunk_size = 1  
             chunks = [message_b64[i:i+chunk_size] for i in range(0, len(message_b64), chunk_size)]
             
@@ -40,89 +193,415 @@ class RabinCipher:
             raise ValueError(f"Encryption failed: {str(e)}")
 
     @staticmethod
-    def decrypt(ciphertext, p, q):
-        def egcd(a, b):
-            if a == 0:
-                return b, 0, 1
+    @lru_cache(maxsize=PRIVATE_KEY_CACHE_SIZE)
+    def legacy_codebook(n):
+        # The legacy format encrypts one base64 character per chunk, so for a
+        # given key there are only 65 possible ciphertext chunks.
+        if n <= max(ord(ch) for ch in BASE64_ALPHABET):
+            return None
+        return {ch: str((ord(ch) * ord(ch)) % n) for ch in BASE64_ALPHABET}
+
+    @staticmethod
+    def encrypt_binary(message, public_key):
+        try:
+            n = public_key
+            width = RabinCipher.token_width(n)
+            blocks = RabinCipher._encrypt_blocks(message.encode(), n)
+            out = bytearray(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, width))
+            if np is not None and isinstance(blocks, np.ndarray):
+                out += NumpyRabinEngine.pack(blocks, width)
             else:
-                g, x, y = egcd(b % a, a)
-                return g, y - (b // a) * x, x
-
-        def modsqrt(a, p):
-            if legendre_symbol(a, p) != 1:
-                return 0
-            elif a == 0:
-                return 0
-            elif p == 2:
-                return 0
-            elif p % 4 == 3:
-                return pow(a, (p + 1) // 4, p)
-            
-            q = p - 1
-            s = 0
-            while q % 2 == 0:
-                q //= 2
-                s += 1
-            
-            z = 2
-            while legendre_symbol(z, p) != -1:
-                z += 1
-            
-            m = s
-            c = pow(z, q, p)
-            t = pow(a, q, p)
-            r = pow(a, (q + 1) // 2, p)
-            
-            while t != 1:
-                i = 0
-                temp = t
-                while temp != 1:
-                    temp = (temp * temp) % p
-                    i += 1
-                    if i == m:
-                        return 0
-                
-                b = pow(c, pow(2, m - i - 1), p)
-                m = i
-                c = (b * b) % p
-                t = (t * c) % p
-                r = (r * b) % p
+                for token in blocks:
+                    out += token.to_bytes(width, 'big')
+            return bytes(out)
+        except Exception as e:
+            raise ValueError(f"Encryption failed: {str(e)}")
+
+    @staticmethod
+    def token_width(n):
+        # A block token is c * 4 + hint < 4 * n.
+        return (n.bit_length() + 2 + 7) // 8
+
+    @staticmethod
+    def encapsulate(public_key, length):
+        # Rabin-KEM: square a fresh random r < n and derive the key from r,
+        # so no two encapsulations share a plaintext, even under one key.
+        # Returns (key bytes, token bytes).
+        try:
+            n = public_key
+            r = secrets.randbelow(n - 1) + 1
+            token = RabinCipher._square_token(r, n).to_bytes(RabinCipher.token_width(n), 'big')
+            return RabinCipher._mgf1(r.to_bytes((n.bit_length() + 7) // 8, 'big'), length), token
+        except Exception as e:
+            raise ValueError(f"Encryption failed: {str(e)}")
+
+    @staticmethod
+    def decapsulate(token, p, q, length):
+        try:
+            key = RabinCipher.private_key(p, q)
+            if len(token) != RabinCipher.token_width(key.n):
+                raise ValueError("Token was written for a different key size")
+            token = int.from_bytes(token, 'big')
+            if token >> 2 >= key.n:
+                raise ValueError("Token is out of range for this key")
+            r = key.select_root(token >> 2, token & 3)
+            return RabinCipher._mgf1(r.to_bytes((key.n.bit_length() + 7) // 8, 'big'), length)
+        except Exception as e:
+            raise ValueError(f"Decryption failed: {str(e)}")
+
+    @staticmethod
+    def encrypt_stream(reader, public_key, chunk_size=STREAM_CHUNK_SIZE):
+        n = public_key
+        size = RabinCipher.block_size(n)
+        if size == 0:
+            raise ValueError(f"Key {n} is too small for block mode")
+        width = RabinCipher.token_width(n)
+        read_size = max(size, chunk_size - chunk_size % size)
+
+        yield BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, width)
+        pending = b''
+        while True:
+            data = reader.read(read_size)
+            if not data:
+                break
+            pending += data
+            usable = len(pending) - len(pending) % size
+            out = bytearray()
+            for i in range(0, usable, size):
+                out += RabinCipher._encrypt_token(pending[i:i + size], n).to_bytes(width, 'big')
+            pending = pending[usable:]
+            if out:
+                yield bytes(out)
+
+        # Only the tail is padded, into one or two final blocks.
+        padded = RabinCipher._pad(pending, size)
+        out = bytearray()
+        for i in range(0, len(padded), size):
+            out += RabinCipher._encrypt_token(padded[i:i + size], n).to_bytes(width, 'big')
+        yield bytes(out)
+
+    @staticmethod
+    def decrypt_stream(reader, p, q, chunk_size=STREAM_CHUNK_SIZE):
+        key = RabinCipher.private_key(p, q)
+        header = reader.read(BINARY_HEADER.size)
+        if header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError("Streaming decryption needs the binary ciphertext container")
+        width = RabinCipher._binary_width(header, key.n)
+        size = RabinCipher.block_size(key.n)
+        read_size = max(width, chunk_size - chunk_size % width)
+
+        # The padding can span the last two blocks, so two decrypted blocks
+        # are always held back until the next read proves they are not last.
+        pending = b''
+        held = b''
+        while True:
+            data = reader.read(read_size)
+            if not data:
+                break
+            pending += data
+            usable = len(pending) - len(pending) % width
+            out = bytearray(held)
+            for i in range(0, usable, width):
+                token = int.from_bytes(pending[i:i + width], 'big')
+                out += RabinCipher._decrypt_token(key, token)
+            pending = pending[usable:]
+            held = bytes(out[-2 * size:])
+            if len(out) > 2 * size:
+                yield bytes(out[:-2 * size])
+
+        if pending:
+            raise ValueError("Truncated ciphertext block")
+        if not held:
+            raise ValueError("Ciphertext has no blocks")
+        data = RabinCipher._unpad(held, size)
+        if data:
+            yield data
+
+    @staticmethod
+    def _binary_width(header, n):
+        magic, version, width = BINARY_HEADER.unpack_from(header)
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported ciphertext version {version}")
+        if width != RabinCipher.token_width(n):
+            raise ValueError("Ciphertext was written for a different key size")
+        return width
+
+    @staticmethod
+    def _binary_body(data, n):
+        width = RabinCipher._binary_width(data, n)
+        body = data[BINARY_HEADER.size:]
+        if len(body) % width != 0:
+            raise ValueError("Truncated ciphertext block")
+        return body, width
+
+    @staticmethod
+    def _iter_binary_blocks(data, n):
+        body, width = RabinCipher._binary_body(data, n)
+        if NumpyRabinEngine.supports(n, len(body) // width):
+            return NumpyRabinEngine.unpack(body, width)
+        return (int.from_bytes(body[i:i + width], 'big') for i in range(0, len(body), width))
+
+    @staticmethod
+    def _encoded_size(n):
+        # Bytes per encoded block; a full block stays below 2**(bits - 1)
+        # and so below n.
+        return max(0, (n.bit_length() - 1) // 8)
+
+    @staticmethod
+    def _seed_size(n):
+        return min(MASK_SEED_SIZE, RabinCipher._encoded_size(n) // 2)
+
+    @staticmethod
+    def block_size(n):
+        # Payload bytes per block: the encoded block less the mask seed.
+        encoded = RabinCipher._encoded_size(n)
+        return encoded - RabinCipher._seed_size(n) if encoded >= 2 else 0
+
+    @staticmethod
+    def _encrypt_blocks(data, n):
+        size = RabinCipher.block_size(n)
+        if size == 0:
+            raise ValueError(f"Key {n} is too small for block mode")
+
+        padded = RabinCipher._pad(data, size)
+        if NumpyRabinEngine.supports(n, len(padded) // size):
+            return NumpyRabinEngine.encrypt(padded, size, n)
+
+        return [RabinCipher._encrypt_token(padded[i:i + size], n)
+                for i in range(0, len(padded), size)]
+
+    @staticmethod
+    def _encrypt_token(block, n):
+        return RabinCipher._square_token(int.from_bytes(RabinCipher._encode_block(block, n), 'big'), n)
+
+    @staticmethod
+    def _square_token(m, n):
+        return ((m * m) % n) << 2 | RabinCipher._root_hint(m, n)
+
+    @staticmethod
+    def _root_hint(m, n):
+        # Williams-style redundancy: the parity of m and whether its Jacobi
+        # symbol is -1. For a Blum modulus these two bits single out m among
+        # the four square roots of m * m. m is the masked encoding, so the
+        # bits say nothing about the plaintext.
+        return (m & 1) | (RabinCipher._jacobi(m, n) == -1) << 1
+
+    @staticmethod
+    def _mgf1(seed, length):
+        # MGF1 over SHA-256, as in RSA-OAEP.
+        out = bytearray()
+        for counter in range(-(-length // hashlib.sha256().digest_size)):
+            out += hashlib.sha256(seed + counter.to_bytes(4, 'big')).digest()
+        return bytes(out[:length])
+
+    @staticmethod
+    def _xor(data, mask):
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(len(data), 'big')
+
+    @staticmethod
+    def _encode_block(block, n):
+        # seed' || block', where block' = block ^ MGF1(seed) and
+        # seed' = seed ^ MGF1(block'), with a fresh seed per block.
+        seed = secrets.token_bytes(RabinCipher._seed_size(n))
+        masked = RabinCipher._xor(block, RabinCipher._mgf1(seed, len(block)))
+        return RabinCipher._xor(seed, RabinCipher._mgf1(masked, len(seed))) + masked
+
+    @staticmethod
+    def _decode_block(encoded, n):
+        split = RabinCipher._seed_size(n)
+        masked = encoded[split:]
+        seed = RabinCipher._xor(encoded[:split], RabinCipher._mgf1(masked, split))
+        return RabinCipher._xor(masked, RabinCipher._mgf1(seed, len(masked)))
+
+    @staticmethod
+    def _jacobi(a, n):
+        if gmpy2 is not None:
+            return gmpy2.jacobi(a, n)
+        a %= n
+        result = 1
+        while a:
+            while a % 2 == 0:
+                a //= 2
+                if n % 8 in (3, 5):
+                    result = -result
+            a, n = n, a
+            if a % 4 == 3 and n % 4 == 3:
+                result = -result
+            a %= n
+        return result if n == 1 else 0
+
+    @staticmethod
+    def _decrypt_blocks(blocks, key):
+        size = RabinCipher.block_size(key.n)
+        if size == 0:
+            raise ValueError(f"Key {key.n} is too small for block mode")
+
+        if np is not None and isinstance(blocks, np.ndarray):
+            if key.blum:
+                return RabinCipher._unpad(NumpyRabinEngine.decrypt(blocks, key, size), size)
+            blocks = blocks.tolist()
+
+        padded = bytearray()
+        for token in blocks:
+            padded += RabinCipher._decrypt_token(key, token)
+        return RabinCipher._unpad(padded, size)
+
+    @staticmethod
+    def _decrypt_token(key, token):
+        width = RabinCipher._encoded_size(key.n)
+        m = key.select_root(token >> 2, token & 3)
+        if m >> (8 * width):
+            raise ValueError(f"Failed to decrypt block {token >> 2}")
+        return RabinCipher._decode_block(m.to_bytes(width, 'big'), key.n)
+
+    @staticmethod
+    def _length_bytes(size):
+        return 1 if size <= 0xFF else 2
+
+    @staticmethod
+    def _pad(data, size):
+        # ISO/IEC 10126-style: random filler, then the padding length in the
+        # last byte or two. Zero filler would leave the last block a small
+        # number times a known power of two, whose square root falls out of
+        # the ciphertext without the key.
+        field = RabinCipher._length_bytes(size)
+        pad = size - len(data) % size
+        if pad < field:
+            pad += size
+        return data + secrets.token_bytes(pad - field) + pad.to_bytes(field, 'big')
+
+    @staticmethod
+    def _unpad(padded, size):
+        field = RabinCipher._length_bytes(size)
+        pad = int.from_bytes(padded[-field:], 'big') if len(padded) >= field else 0
+        if not field <= pad < field + size or pad > len(padded):
+            raise ValueError("Invalid block padding")
+        return bytes(padded[:len(padded) - pad])
+
+    @staticmethod
+    def _modsqrt(a, p):
+        if RabinCipher._legendre_symbol(a, p) != 1:
+            return 0
+        elif a == 0:
+            return 0
+        elif p == 2:
+            return 0
+        elif p % 4 == 3:
+            return _powmod(a, (p + 1) // 4, p)
+        
+        q = p - 1
+        s = 0
+        while q % 2 == 0:
+            q //= 2
+            s += 1
+        
+        z = 2
+        while RabinCipher._legendre_symbol(z, p) != -1:
+            z += 1
+        
+        m = s
+        c = _powmod(z, q, p)
+        t = _powmod(a, q, p)
+        r = _powmod(a, (q + 1) // 2, p)
+        
+        while t != 1:
+            i = 0
+            temp = t
+            while temp != 1:
+                temp = (temp * temp) % p
+                i += 1
+                if i == m:
+                    return 0
             
-            return r
+            b = _powmod(c, 1 << (m - i - 1), p)
+            m = i
+            c = (b * b) % p
+            t = (t * c) % p
+            r = (r * b) % p
+        
+        return r
 
-        def legendre_symbol(a, p):
-            ls = pow(a, (p - 1) // 2, p)
-            return -1 if ls == p - 1 else ls
+    @staticmethod
+    def _legendre_symbol(a, p):
+        ls = _powmod(a, (p - 1) // 2, p)
+        return -1 if ls == p - 1 else ls
 
+    @staticmethod
+    def decrypt(ciphertext, p, q):
         try:
-            n = p * q
-            encrypted_chunks = [int(x) for x in ciphertext.split(',')]
-            decrypted_chunks = []
+            key = RabinCipher.private_key(p, q)
+        except Exception as e:
+            raise ValueError(f"Decryption failed: {str(e)}")
+        return key.decrypt(ciphertext)
+
+    @staticmethod
+    def decrypt_parallel(ciphertext, p, q, workers=None, batch_size=PARALLEL_BATCH_SIZE):
+        if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+            binary = memoryview(ciphertext)[:len(BINARY_MAGIC)] == BINARY_MAGIC
+            parallel = binary
+        else:
+            binary = False
+            parallel = ciphertext.startswith(BLOCK_PREFIX)
+        if not parallel:
+            # Legacy chunks are already codebook lookups.
+            return RabinCipher.decrypt(ciphertext, p, q)
+
+        try:
+            key = RabinCipher.private_key(p, q)
+            if binary:
+                blocks = RabinCipher._iter_binary_blocks(memoryview(ciphertext), key.n)
+                if np is None or not isinstance(blocks, np.ndarray):
+                    blocks = list(blocks)
+            else:
+                blocks = [int(x) for x in ciphertext[len(BLOCK_PREFIX):].split(',')]
+            if np is not None and isinstance(blocks, np.ndarray):
+                # Small moduli take the vectorized path, which beats a pool.
+                return RabinCipher._decrypt_blocks(blocks, key).decode()
+
+            workers = workers or os.cpu_count() or 1
+            if workers <= 1 or len(blocks) <= batch_size:
+                return RabinCipher._decrypt_blocks(blocks, key).decode()
+
+            batches = [blocks[i:i + batch_size] for i in range(0, len(blocks), batch_size)]
+            # The key goes to each worker once, through the initializer,
+            # rather than with every batch.
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_decrypt_worker,
+                                     initargs=(p, q)) as pool:
+                padded = b''.join(pool.map(_decrypt_batch, batches))
+            return RabinCipher._unpad(padded, RabinCipher.block_size(key.n)).decode()
+        except Exception as e:
+            raise ValueError(f"Decryption failed: {str(e)}")
+
+    @staticmethod
+    @lru_cache(maxsize=PRIVATE_KEY_CACHE_SIZE)
+    def private_key(p, q):
+        return RabinPrivateKey(p, q)
+
+    @staticmethod
+    def _decrypt_with_key(ciphertext, key):
+        try:
+            if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+                data = memoryview(ciphertext)
+                if data[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+                    blocks = RabinCipher._iter_binary_blocks(data, key.n)
+                    return RabinCipher._decrypt_blocks(blocks, key).decode()
+                ciphertext = bytes(data).decode('ascii').strip()
 
-            for c in encrypted_chunks:
-                mp = modsqrt(c, p)
-                mq = modsqrt(c, q)
-                _, yp, yq = egcd(p, q)
-                
-                r1 = (yp * p * mq + yq * q * mp) % n
-                r2 = n - r1
-                r3 = (yp * p * (-mq) + yq * q * mp) % n
-                r4 = n - r3
-
-                valid_chunk = None
-                for r in [r1, r2, r3, r4]:
-                    try:
-                        chunk_bytes = r.to_bytes((r.bit_length() + 7) // 8, 'big')
-                        chunk = chunk_bytes.decode('ascii')
-                        if all(c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=' for c in chunk):
-                            valid_chunk = chunk
-                            break
-                    except:
-                        continue
+            if ciphertext.startswith(BLOCK_PREFIX):
+                blocks = [int(x) for x in ciphertext[len(BLOCK_PREFIX):].split(',')]
+                if NumpyRabinEngine.supports(key.n, len(blocks)):
+                    blocks = np.array(blocks, dtype=np.int64)
+                return RabinCipher._decrypt_blocks(blocks, key).decode()
 
+            codebook = key.legacy_codebook()
+            decrypted_chunks = []
+            for x in ciphertext.split(','):
+                valid_chunk = codebook.get(x)
                 if valid_chunk is None:
-                    raise ValueError(f"Failed to decrypt chunk {c}")
-                    
+                    c = int(x)
+                    valid_chunk = RabinCipher._legacy_chunk(key, c)
+                    if valid_chunk is None:
+                        raise ValueError(f"Failed to decrypt chunk {c}")
                 decrypted_chunks.append(valid_chunk)
 
             decrypted_b64 = ''.join(decrypted_chunks)
@@ -133,6 +612,193 @@ class RabinCipher:
         except Exception as e:
             raise ValueError(f"Decryption failed: {str(e)}")
 
+    @staticmethod
+    def _legacy_chunk(key, c):
+        for r in key.square_roots(c):
+            chunk_bytes = r.to_bytes((r.bit_length() + 7) // 8, 'big')
+            if _BASE64_BYTES.issuperset(chunk_bytes):
+                return chunk_bytes.decode('ascii')
+        return None
+
+    @staticmethod
+    def arithmetic_backend():
+        return ARITHMETIC_BACKEND
+
     @staticmethod
     def get_key_type():
-        return "rabin" 
\ No newline at end of file
+        return "rabin" 
+
+
+class RabinPrivateKey:
+    # Everything decryption needs that depends only on (p, q), computed once
+    # instead of per chunk.
+    def __init__(self, p, q):
+        if p == q:
+            raise ValueError("Private keys p and q must be distinct primes")
+        self.p = p
+        self.q = q
+        self.n = p * q
+        self.q_inv = _invert(q, p)
+        # Both primes = 3 (mod 4): a square root is one exponentiation, with
+        # no Legendre check or Tonelli-Shanks.
+        self.blum = p % 4 == 3 and q % 4 == 3
+        self.exp_p = (p + 1) // 4
+        self.exp_q = (q + 1) // 4
+        self._legacy_codebook = None
+
+    def square_roots(self, c):
+        p, q = self.p, self.q
+        if self.blum:
+            mp = _powmod(c, self.exp_p, p)
+            mq = _powmod(c, self.exp_q, q)
+        else:
+            mp = RabinCipher._modsqrt(c, p)
+            mq = RabinCipher._modsqrt(c, q)
+        r1 = self._combine(mp, mq)
+        r3 = self._combine(mp, -mq % q)
+        return r1, self.n - r1, r3, self.n - r3
+
+    def select_root(self, c, hint):
+        if not self.blum:
+            # Without p = q = 3 (mod 4) two roots can share both hint bits.
+            raise ValueError("Block mode needs primes congruent to 3 mod 4")
+
+        # mp and mq are themselves quadratic residues, so the root built from
+        # (mp, mq) and its negation have Jacobi symbol 1, while the pair built
+        # from (mp, -mq) has -1. Parity then separates r from n - r.
+        mp = _powmod(c, self.exp_p, self.p)
+        mq = _powmod(c, self.exp_q, self.q)
+        if hint & 2:
+            mq = -mq % self.q
+        r = self._combine(mp, mq)
+        if r & 1 != hint & 1:
+            r = self.n - r
+        return r
+
+    def _combine(self, mp, mq):
+        # Garner's CRT: the x < n with x = mp (mod p) and x = mq (mod q).
+        return mq + self.q * (((mp - mq) * self.q_inv) % self.p)
+
+    def legacy_codebook(self):
+        # Reverse of RabinCipher.legacy_codebook, keyed by the ciphertext
+        # chunk text. Each entry comes from the normal root selection, so
+        # lookups give exactly what decrypting the chunk would.
+        if self._legacy_codebook is None:
+            codebook = {}
+            for ch in BASE64_ALPHABET:
+                if ord(ch) < self.n:
+                    c = (ord(ch) * ord(ch)) % self.n
+                    chunk = RabinCipher._legacy_chunk(self, c)
+                    if chunk is not None:
+                        codebook[str(c)] = chunk
+            self._legacy_codebook = codebook
+        return self._legacy_codebook
+
+    def decrypt(self, ciphertext):
+        return RabinCipher._decrypt_with_key(ciphertext, self)
+
+
+class NumpyRabinEngine:
+    # Whole-array Rabin for moduli below 2**31, where every value and every
+    # product of two residues fits in int64. Such moduli have a one-byte
+    # mask seed and at most two payload bytes, so both MGF1 masks come from
+    # lookup tables instead of a hash per block.
+    @staticmethod
+    def supports(n, count):
+        return (np is not None and n.bit_length() <= NUMPY_MAX_MODULUS_BITS
+                and count >= NUMPY_MIN_BLOCKS)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def mask_tables(size):
+        seed_masks = np.array([int.from_bytes(RabinCipher._mgf1(bytes([seed]), size), 'big')
+                               for seed in range(256)], dtype=np.int64)
+        payload_masks = np.array([RabinCipher._mgf1(masked.to_bytes(size, 'big'), 1)[0]
+                                  for masked in range(1 << (8 * size))], dtype=np.int64)
+        return seed_masks, payload_masks
+
+    @staticmethod
+    def encrypt(padded, size, n):
+        blocks = np.frombuffer(padded, dtype=np.uint8).reshape(-1, size).astype(np.int64)
+        m = np.zeros(len(blocks), dtype=np.int64)
+        for column in range(size):
+            m = (m << 8) | blocks[:, column]
+        # RabinCipher._encode_block, per element.
+        seed_masks, payload_masks = NumpyRabinEngine.mask_tables(size)
+        seed = np.frombuffer(secrets.token_bytes(len(m)), dtype=np.uint8).astype(np.int64)
+        masked = m ^ seed_masks[seed]
+        m = (seed ^ payload_masks[masked]) << (8 * size) | masked
+        hint = (m & 1) | ((NumpyRabinEngine.jacobi(m, n) == -1).astype(np.int64) << 1)
+        return ((m * m) % n) << 2 | hint
+
+    @staticmethod
+    def decrypt(tokens, key, size):
+        # Same root selection as RabinPrivateKey.select_root, per element.
+        c = tokens >> 2
+        hint = tokens & 3
+        mp = NumpyRabinEngine.powmod(c, key.exp_p, key.p)
+        mq = NumpyRabinEngine.powmod(c, key.exp_q, key.q)
+        mq = np.where(hint & 2, (key.q - mq) % key.q, mq)
+        r = mq + key.q * ((((mp - mq) % key.p) * key.q_inv) % key.p)
+        r = np.where((r & 1) != (hint & 1), key.n - r, r)
+        bad = np.flatnonzero(r >> (8 * (size + 1)))
+        if len(bad):
+            raise ValueError(f"Failed to decrypt block {int(c[bad[0]])}")
+        seed_masks, payload_masks = NumpyRabinEngine.mask_tables(size)
+        masked = r & ((1 << (8 * size)) - 1)
+        seed = (r >> (8 * size)) ^ payload_masks[masked]
+        return NumpyRabinEngine.pack(masked ^ seed_masks[seed], size)
+
+    @staticmethod
+    def powmod(base, exponent, modulus):
+        result = np.ones_like(base)
+        base = base % modulus
+        while exponent:
+            if exponent & 1:
+                result = (result * base) % modulus
+            base = (base * base) % modulus
+            exponent >>= 1
+        return result
+
+    @staticmethod
+    def jacobi(a, n):
+        # RabinCipher._jacobi run on every element at once. Each step strips
+        # all factors of two together, then swaps; finished elements
+        # (a == 0) just carry through.
+        a = a % n
+        n = np.full_like(a, n)
+        result = np.ones_like(a)
+        active = a != 0
+        while active.any():
+            low = np.where(active, a & -a, 1)
+            twos = np.log2(low).astype(np.int64)
+            a = a >> twos
+            result[((twos & 1) == 1) & ((n % 8 == 3) | (n % 8 == 5))] *= -1
+            result[active & (a % 4 == 3) & (n % 4 == 3)] *= -1
+            a, n = np.where(active, n % np.where(active, a, 1), 0), np.where(active, a, n)
+            active = a != 0
+        result[n != 1] = 0
+        return result
+
+    @staticmethod
+    def pack(values, width):
+        raw = values.astype('>u8').view(np.uint8).reshape(-1, 8)
+        return raw[:, 8 - width:].tobytes()
+
+    @staticmethod
+    def unpack(body, width):
+        raw = np.zeros((len(body) // width, 8), dtype=np.uint8)
+        raw[:, 8 - width:] = np.frombuffer(body, dtype=np.uint8).reshape(-1, width)
+        return raw.view('>u8').ravel().astype(np.int64)
+
+
+_worker_key = None
+
+
+def _init_decrypt_worker(p, q):
+    global _worker_key
+    _worker_key = RabinCipher.private_key(p, q)
+
+
+def _decrypt_batch(blocks):
+    return b''.join(RabinCipher._decrypt_token(_worker_key, token) for token in blocks)
@@ -0,0 +1,232 @@
+import io
+import json
+import struct
+from metadata_store import (JsonMetadataStore, atomic_write, expiry_entries, file_lock,
+                            iter_meta_files, locked_file)
+
+# Layout: fixed header, then a metadata section with spare room so attempt
+# updates can be written in place, then the real payload, then the decoy.
+#   magic, version, flags, metadata capacity, metadata length,
+#   real offset, real length, decoy offset, decoy length
+CONTAINER_MAGIC = b"SFC1"
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct('>4sBB2xIIQQQQ')
+METADATA_SLACK = 128
+METADATA_ALIGN = 64
+
+
+class SecureContainer:
+    @staticmethod
+    def is_container(file_path):
+        try:
+            with open(file_path, 'rb') as f:
+                return f.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC
+        except OSError:
+            return False
+
+    @staticmethod
+    def _metadata_capacity(length):
+        return -(-(length + METADATA_SLACK) // METADATA_ALIGN) * METADATA_ALIGN
+
+    @staticmethod
+    def pack(payload, metadata, decoy=b''):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if isinstance(decoy, str):
+            decoy = decoy.encode()
+        encoded = json.dumps(metadata).encode()
+        capacity = SecureContainer._metadata_capacity(len(encoded))
+        real_offset = CONTAINER_HEADER.size + capacity
+        decoy_offset = real_offset + len(payload)
+        header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, capacity, len(encoded),
+                                       real_offset, len(payload), decoy_offset, len(decoy))
+        return b''.join([header, encoded.ljust(capacity, b' '), payload, decoy])
+
+    @staticmethod
+    def write(file_path, payload, metadata, decoy=b''):
+        # Built in memory and written once, then one fsync: a single inode
+        # instead of ciphertext, .fake and .meta.
+        atomic_write(file_path, SecureContainer.pack(payload, metadata, decoy), fsync=True)
+
+    @staticmethod
+    def _read_header(f):
+        header = f.read(CONTAINER_HEADER.size)
+        if len(header) < CONTAINER_HEADER.size:
+            raise ValueError("Not a secure container")
+        fields = CONTAINER_HEADER.unpack(header)
+        if fields[0] != CONTAINER_MAGIC:
+            raise ValueError("Not a secure container")
+        if fields[1] != CONTAINER_VERSION:
+            raise ValueError(f"Unsupported container version {fields[1]}")
+        return fields[3:]
+
+    @staticmethod
+    def _read_metadata(f):
+        capacity, length = SecureContainer._read_header(f)[:2]
+        return json.loads(f.read(length))
+
+    @staticmethod
+    def read_metadata(file_path):
+        with open(file_path, 'rb') as f:
+            with file_lock(f, False):
+                return SecureContainer._read_metadata(f)
+
+    @staticmethod
+    def read_payload(file_path, decoy=False):
+        # One open, one header read, one seek.
+        with open(file_path, 'rb') as f:
+            _, _, real_offset, real_length, decoy_offset, decoy_length = SecureContainer._read_header(f)
+            offset, length = (decoy_offset, decoy_length) if decoy else (real_offset, real_length)
+            f.seek(offset)
+            return f.read(length)
+
+    @staticmethod
+    def update_metadata(file_path, update):
+        # update(metadata) returns the new metadata or None to leave it be;
+        # the old metadata is returned. Runs under an exclusive lock and
+        # rewrites only the header and metadata section when they fit.
+        with locked_file(file_path, 'r+b') as f:
+            capacity, _, real_offset, real_length, decoy_offset, decoy_length = SecureContainer._read_header(f)
+            f.seek(0)
+            metadata = SecureContainer._read_metadata(f)
+            new_metadata = update(dict(metadata))
+            if new_metadata is None:
+                return metadata
+
+            encoded = json.dumps(new_metadata).encode()
+            if len(encoded) <= capacity:
+                header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, capacity,
+                                               len(encoded), real_offset, real_length,
+                                               decoy_offset, decoy_length)
+                f.seek(0)
+                f.write(header + encoded.ljust(capacity, b' '))
+                # Flush while still holding the lock.
+                f.flush()
+                return metadata
+
+            f.seek(real_offset)
+            payload = f.read(real_length)
+            f.seek(decoy_offset)
+            decoy = f.read(decoy_length)
+            SecureContainer.write(file_path, payload, new_metadata, decoy)
+            return metadata
+
+
+class PayloadReader(io.RawIOBase):
+    # Read-only view of one section of an open container, so a payload can
+    # be streamed without copying it out first. Closing it closes the file.
+    def __init__(self, f, offset, length):
+        super().__init__()
+        self._f = f
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        count = min(len(b), self._length - self._pos)
+        if count <= 0:
+            return 0
+        self._f.seek(self._offset + self._pos)
+        count = self._f.readinto(memoryview(b)[:count])
+        self._pos += count
+        return count
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._length
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+class ContainerMetadataStore:
+    # Metadata kept inside the container itself. Files that are not
+    # containers, i.e. ones protected before the format existed, are served
+    # from their .meta sidecar so their protection still applies.
+    def __init__(self, fallback=None):
+        self.fallback = fallback if fallback is not None else JsonMetadataStore()
+
+    def write_container(self, file_path, payload, metadata, decoy=b''):
+        SecureContainer.write(file_path, payload, metadata, decoy)
+        self.fallback.delete(file_path)
+
+    def open_payload(self, file_path, decoy=False):
+        # One open: check the magic, read the header and hand back a reader
+        # over just the requested section.
+        f = open(file_path, 'rb')
+        try:
+            if f.read(len(CONTAINER_MAGIC)) != CONTAINER_MAGIC:
+                if not decoy:
+                    f.seek(0)
+                    return f
+                f.close()
+                return open(file_path + '.fake', 'rb')
+            f.seek(0)
+            _, _, real_offset, real_length, decoy_offset, decoy_length = SecureContainer._read_header(f)
+        except BaseException:
+            f.close()
+            raise
+        offset, length = (decoy_offset, decoy_length) if decoy else (real_offset, real_length)
+        return io.BufferedReader(PayloadReader(f, offset, length))
+
+    def load(self, file_path):
+        try:
+            return SecureContainer.read_metadata(file_path)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return self.fallback.load(file_path)
+
+    def save(self, file_path, metadata):
+        try:
+            SecureContainer.update_metadata(file_path, lambda _: metadata)
+        except (FileNotFoundError, ValueError):
+            self.fallback.save(file_path, metadata)
+
+    def delete(self, file_path):
+        # A container's metadata goes with the file; only sidecars remain.
+        self.fallback.delete(file_path)
+
+    def decrement_attempts(self, file_path):
+        def take(metadata):
+            if (metadata.get('attempts_left') or 0) <= 0:
+                return None
+            return dict(metadata, attempts_left=metadata['attempts_left'] - 1)
+        try:
+            return SecureContainer.update_metadata(file_path, take)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return self.fallback.decrement_attempts(file_path)
+
+    def iter_metadata(self, root):
+        extension = self.fallback.extension
+        for path in iter_meta_files(root, ''):
+            if path.endswith(extension):
+                continue
+            try:
+                metadata = self.load(path)
+            except (OSError, ValueError):
+                continue
+            if metadata is not None:
+                yield path, metadata
+
+    def iter_expiry(self, root):
+        return expiry_entries(self.iter_metadata(root))
@@ -1,48 +1,64 @@
 import os
-import json
 import time
 from datetime import datetime, timedelta
-import hashlib
+from metadata_store import JsonMetadataStore
+from password_kdf import PasswordKdf
 
 class SecurityFeatures:
-    def __init__(self):
+    def __init__(self, store=None, kdf=None):
         self.metadata_extension = ".meta"
+        # Per-file .meta JSON by default; pass a SqliteMetadataStore to keep
+        # everything in one indexed database instead, or a
+        # ContainerMetadataStore to write single-file containers.
+        self.store = store if store is not None else JsonMetadataStore(self.metadata_extension)
+        self.sweeper = None
+        self.kdf = kdf if kdf is not None else PasswordKdf()
         
     def encrypt_with_security(self, file_path, encrypted_content, expiry_hours=None, 
                             max_attempts=None, fake_password=None, fake_content=None):
       
+        if hasattr(self.store, 'write_container'):
+            metadata = self._build_metadata(expiry_hours, max_attempts, fake_password, fake_content)
+            self.store.write_container(file_path, encrypted_content, metadata, fake_content or b'')
+            self._schedule_expiry(file_path, metadata)
+            return
        
-        with open(file_path, 'w') as f:
+        mode = 'wb' if isinstance(encrypted_content, (bytes, bytearray)) else 'w'
+        with open(file_path, mode) as f:
             f.write(encrypted_content)
+
+        self.apply_security(file_path, expiry_hours, max_attempts, fake_password, fake_content)
+
+    def apply_security(self, file_path, expiry_hours=None, max_attempts=None,
+                       fake_password=None, fake_content=None):
+        # For ciphertext already written in place, e.g. by Skipjack.encrypt_file.
+        metadata = self._build_metadata(expiry_hours, max_attempts, fake_password, fake_content)
+       
+        if fake_content:
+            fake_file = file_path + '.fake'
+            with open(fake_file, 'w') as f:
+                f.write(fake_content)
         
-      
-        metadata = {
+        self.store.save(file_path, metadata)
+        self._schedule_expiry(file_path, metadata)
+
+    def _build_metadata(self, expiry_hours, max_attempts, fake_password, fake_content):
+        return {
             'created_at': time.time(),
             'attempts_left': max_attempts if max_attempts is not None else -1,  
             'expiry_time': time.time() + (expiry_hours * 3600) if expiry_hours else None,
             'fake_password_hash': self._hash_password(fake_password) if fake_password else None,
             'has_fake_content': bool(fake_content)
         }
-        
-       
-        if fake_content:
-            fake_file = file_path + '.fake'
-            with open(fake_file, 'w') as f:
-                f.write(fake_content)
-        
-       
-        metadata_file = file_path + self.metadata_extension
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f)
+
+    def _schedule_expiry(self, file_path, metadata):
+        if self.sweeper is not None and metadata['expiry_time']:
+            self.sweeper.schedule(file_path, metadata['expiry_time'])
              
     def check_security(self, file_path, password=None):
        
-        metadata_file = file_path + self.metadata_extension
-        
-        try:
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
-        except FileNotFoundError:
+        metadata = self.store.load(file_path)
+        if metadata is None:
             return True, False, "No security metadata found"
             
        
@@ -55,16 +71,18 @@ class SecurityFeatures:
         if metadata.get('attempts_left') is not None:
             if metadata['attempts_left'] == -1:  
                 pass
-            elif metadata['attempts_left'] <= 0:
-                self._delete_files(file_path)
-                return False, False, "Maximum attempts exceeded, file deleted"
             else:
+                # The store does the read-modify-write atomically, so parallel
+                # attempts cannot both spend the same count.
+                metadata = self.store.decrement_attempts(file_path)
+                if metadata is None or metadata['attempts_left'] <= 0:
+                    self._delete_files(file_path)
+                    return False, False, "Maximum attempts exceeded, file deleted"
                 metadata['attempts_left'] -= 1
-                self._save_metadata(metadata_file, metadata)
                 
        
         if password and metadata.get('fake_password_hash'):
-            if self._hash_password(password) == metadata['fake_password_hash']:
+            if self._verify_password(password, metadata['fake_password_hash']):
                 if metadata.get('has_fake_content'):
                     return True, True, "Accessing fake content"
                 return False, False, "Invalid password"
@@ -75,20 +93,28 @@ class SecurityFeatures:
         
         return True, False, attempts_msg
     
+    def open_payload(self, file_path, is_fake=False):
+        # Binary file object for the real or decoy payload, wherever the
+        # store keeps it.
+        if hasattr(self.store, 'open_payload'):
+            return self.store.open_payload(file_path, is_fake)
+        return open(file_path + '.fake' if is_fake else file_path, 'rb')
+
     def _hash_password(self, password):
         if not password:
             return None
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.kdf.hash(password)
+
+    def _verify_password(self, password, password_hash):
+        return self.kdf.verify(password, password_hash)
     
-    def _save_metadata(self, metadata_file, metadata):
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f)
+    def _save_metadata(self, file_path, metadata):
+        self.store.save(file_path, metadata)
         
     def _delete_files(self, base_file_path):
       
         files_to_delete = [
             base_file_path,
-            base_file_path + self.metadata_extension,
             base_file_path + '.fake'
         ]
         for file_path in files_to_delete:
@@ -96,27 +122,26 @@ class SecurityFeatures:
                 os.remove(file_path)
             except FileNotFoundError:
                 pass
+        self.store.delete(base_file_path)
 
     def get_file_info(self, file_path):
        
-        try:
-            with open(file_path + self.metadata_extension, 'r') as f:
-                metadata = json.load(f)
-                
-            info = []
-            if metadata.get('expiry_time'):
-                expiry_date = datetime.fromtimestamp(metadata['expiry_time'])
-                info.append(f"Expires: {expiry_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        metadata = self.store.load(file_path)
+        if metadata is None:
+            return "No security metadata found"
+
+        info = []
+        if metadata.get('expiry_time'):
+            expiry_date = datetime.fromtimestamp(metadata['expiry_time'])
+            info.append(f"Expires: {expiry_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        if metadata.get('attempts_left') is not None:
+            if metadata['attempts_left'] == -1:
+                info.append("Unlimited attempts")
+            else:
+                info.append(f"Attempts left: {metadata['attempts_left']}")
             
-            if metadata.get('attempts_left') is not None:
-                if metadata['attempts_left'] == -1:
-                    info.append("Unlimited attempts")
-                else:
-                    info.append(f"Attempts left: {metadata['attempts_left']}")
-                
-            if metadata.get('fake_password_hash'):
-                info.append("Has fake password protection")
-                
-            return "\n".join(info) if info else "No security features enabled"
-        except FileNotFoundError:
-            return "No security metadata found" 
\ No newline at end of file
+        if metadata.get('fake_password_hash'):
+            info.append("Has fake password protection")
+            
+        return "\n".join(info) if info else "No security features enabled" 
\ No newline at end of file
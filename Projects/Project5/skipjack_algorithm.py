@@ -1,5 +1,70 @@
+import io
+import mmap
+import os
 import random
+import secrets
 import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from math import lcm
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Inputs smaller than this are not worth the process start-up and copies.
+PARALLEL_MIN_BYTES = 8 << 20
+DEFAULT_SCHEDULE_CACHE_SIZE = 64
+SESSION_KEY_LENGTH = 32
+
+
+class KeyScheduleCache:
+    def __init__(self, maxsize=DEFAULT_SCHEDULE_CACHE_SIZE):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            schedule = self._entries.get(key)
+            if schedule is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return schedule
+            self.misses += 1
+
+        # Built outside the lock so a slow miss does not stall hits on
+        # other keys; a concurrent miss on the same key just builds twice.
+        schedule = build(key)
+        with self._lock:
+            self._entries[key] = schedule
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return schedule
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
 
 class Skipjack:
     FTABLE = [
@@ -13,12 +78,26 @@ class Skipjack:
         81, 163,  64, 143, 146, 157,  56, 245, 188, 182, 218,  33,  16, 255, 243, 210
     ]
 
+    # Raw ciphertext files start with this tag; anything else is read as the
+    # legacy hex text produced by encrypt().
+    BINARY_MAGIC = b"SJB1"
+
+    # Shared by all instances; a service reusing a few keys builds each
+    # schedule once.
+    schedule_cache = KeyScheduleCache()
+
     def __init__(self):
         self.key = None
 
     def _generate_key(self):
         return ''.join(random.choices(string.ascii_letters + string.digits, k=10))
 
+    @staticmethod
+    def generate_session_key(length=SESSION_KEY_LENGTH):
+        # Single-use keys for hybrid envelopes, so drawn from a CSPRNG.
+        alphabet = string.ascii_letters + string.digits
+        return ''.join(secrets.choice(alphabet) for _ in range(length))
+
     def _prepare_key(self, key):
         if not isinstance(key, str):
             raise ValueError("Key must be a string")
@@ -28,65 +107,439 @@ class Skipjack:
             raise ValueError("Key must contain only ASCII characters")
         return key
 
-    def _f_function(self, input_byte, key_byte, round_num):
-        index = (input_byte ^ key_byte ^ round_num) & 0x7F
-        return self.FTABLE[index]
+    def _key_schedule(self, key):
+        if not isinstance(key, str):
+            raise ValueError("Key must be a string")
+        schedule = self.schedule_cache.get(key, self._build_schedule)
+        self.key = schedule.key
+        return schedule
 
-    def _process_block(self, block, key_byte, round_num, encrypt=True):
-        if encrypt:
-            return self._f_function(block, key_byte, round_num)
-        else:
-            for i in range(128):
-                if self._f_function(i, key_byte, round_num) == block:
-                    return i
-            return block
+    def _build_schedule(self, key):
+        return SkipjackKeySchedule(self._prepare_key(key))
+
+    @classmethod
+    def cache_info(cls):
+        return cls.schedule_cache.info()
 
     def encrypt(self, message, key):
         if not isinstance(message, str):
             raise ValueError("Message must be a string")
         if not message:
             raise ValueError("Message cannot be empty")
-        if not all(ord(c) < 128 for c in message):
+        if not message.isascii():
             raise ValueError("Message must contain only ASCII characters")
 
-        self.key = self._prepare_key(key)
-        key_len = len(self.key)
-        
-        result = []
-        for i, char in enumerate(message):
-            char_val = ord(char)
-            key_byte = ord(self.key[i % key_len])
-            round_num = i % 256
-            
-            encrypted = self._process_block(char_val, key_byte, round_num, encrypt=True)
-            result.append(f"{encrypted:02x}")
-            
-        return ''.join(result)
+        schedule = self._key_schedule(key)
+        return schedule.transform(message.encode('ascii')).hex()
 
     def decrypt(self, ciphertext, key):
         if not isinstance(ciphertext, str):
             raise ValueError("Ciphertext must be a string")
         if not ciphertext:
             raise ValueError("Ciphertext cannot be empty")
-        if not all(c in string.hexdigits for c in ciphertext):
+        if not set(ciphertext) <= _HEX_DIGITS:
             raise ValueError("Ciphertext must be a hex string")
         if len(ciphertext) % 2 != 0:
             raise ValueError("Invalid ciphertext length")
 
-        self.key = self._prepare_key(key)
-        key_len = len(self.key)
-        
-        result = []
-        for i in range(0, len(ciphertext), 2):
-            encrypted = int(ciphertext[i:i+2], 16)
-            key_byte = ord(self.key[(i//2) % key_len])
-            round_num = (i//2) % 256
-            
-            decrypted = self._process_block(encrypted, key_byte, round_num, encrypt=False)
-            result.append(chr(decrypted))
-            
-        return ''.join(result)
+        schedule = self._key_schedule(key)
+        # Bytes with no preimage in FTABLE pass through unchanged, so they
+        # can be >= 128; latin-1 maps them back to the same code points.
+        return schedule.transform(bytes.fromhex(ciphertext), decrypt=True).decode('latin-1')
+
+    def encrypt_bytes(self, data, key):
+        data = self._as_bytes(data, "Message")
+        if not data.isascii():
+            raise ValueError("Message must contain only ASCII bytes")
+
+        schedule = self._key_schedule(key)
+        return bytes(schedule.transform(data))
+
+    def decrypt_bytes(self, ciphertext, key):
+        ciphertext = self._as_bytes(ciphertext, "Ciphertext")
+        schedule = self._key_schedule(key)
+        return bytes(schedule.transform(ciphertext, decrypt=True))
+
+    def encrypt_stream(self, reader, writer, key, chunk_size=DEFAULT_CHUNK_SIZE, encoding="binary"):
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+        if encoding not in ("binary", "hex"):
+            raise ValueError(f"Unknown ciphertext encoding: {encoding}")
+
+        schedule = self._key_schedule(key)
+        if encoding == "binary":
+            writer.write(self.BINARY_MAGIC)
+
+        offset = 0
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+            if not chunk.isascii():
+                raise ValueError("Message must contain only ASCII bytes")
+            encrypted = schedule.transform(chunk, offset)
+            writer.write(encrypted if encoding == "binary" else encrypted.hex().encode('ascii'))
+            offset += len(chunk)
+        return offset
+
+    def decrypt_stream(self, reader, writer, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+
+        schedule = self._key_schedule(key)
+        head = reader.read(len(self.BINARY_MAGIC))
+        if head == self.BINARY_MAGIC:
+            chunks = iter(lambda: reader.read(chunk_size), b'')
+        else:
+            chunks = self._iter_hex_chunks(reader, b''.join(head.split()), chunk_size)
+
+        offset = 0
+        for chunk in chunks:
+            writer.write(schedule.transform(chunk, offset, decrypt=True))
+            offset += len(chunk)
+        return offset
+
+    def encrypt_parallel(self, data, key, workers=None, min_bytes=PARALLEL_MIN_BYTES):
+        data = self._as_bytes(data, "Message")
+        if not data.isascii():
+            raise ValueError("Message must contain only ASCII bytes")
+        return self._transform_parallel(data, key, False, workers, min_bytes)
+
+    def decrypt_parallel(self, ciphertext, key, workers=None, min_bytes=PARALLEL_MIN_BYTES):
+        ciphertext = self._as_bytes(ciphertext, "Ciphertext")
+        return self._transform_parallel(ciphertext, key, True, workers, min_bytes)
+
+    def _transform_parallel(self, data, key, decrypt, workers, min_bytes):
+        schedule = self._key_schedule(key)
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(data) < min_bytes:
+            return bytes(schedule.transform(data, decrypt=decrypt))
+
+        shard_size = -(-len(data) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_transform_shard, schedule.key, data[pos:pos + shard_size], pos, decrypt)
+                       for pos in range(0, len(data), shard_size)]
+            return b''.join(future.result() for future in futures)
+
+    def encrypt_file(self, input_path, output_path, key, chunk_size=DEFAULT_CHUNK_SIZE,
+                     workers=1, min_parallel_bytes=PARALLEL_MIN_BYTES):
+        schedule = self._key_schedule(key)
+        header = self.BINARY_MAGIC
+        with open(input_path, 'rb') as src:
+            length = os.fstat(src.fileno()).st_size
+            if length:
+                with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as src_map:
+                    self._check_ascii_map(src_map, chunk_size)
+        with open(output_path, 'wb') as dst:
+            dst.write(header)
+            dst.truncate(len(header) + length)
+
+        self._transform_file_range(schedule.key, input_path, 0, output_path, len(header), length,
+                                   False, chunk_size, workers, min_parallel_bytes)
+        return length
+
+    def decrypt_file(self, input_path, output_path, key, chunk_size=DEFAULT_CHUNK_SIZE,
+                     workers=1, min_parallel_bytes=PARALLEL_MIN_BYTES):
+        schedule = self._key_schedule(key)
+        header = self.BINARY_MAGIC
+        with open(input_path, 'rb') as src:
+            if src.read(len(header)) != header:
+                # Legacy hex files have no fixed byte-to-offset mapping.
+                src.seek(0)
+                with open(output_path, 'wb') as dst:
+                    return self.decrypt_stream(src, dst, key, chunk_size)
+            length = os.fstat(src.fileno()).st_size - len(header)
+        with open(output_path, 'wb') as dst:
+            dst.truncate(length)
+
+        self._transform_file_range(schedule.key, input_path, len(header), output_path, 0, length,
+                                   True, chunk_size, workers, min_parallel_bytes)
+        return length
+
+    def transform_file_in_place(self, file_path, key, decrypt=False, start=0,
+                                chunk_size=DEFAULT_CHUNK_SIZE, workers=1,
+                                min_parallel_bytes=PARALLEL_MIN_BYTES):
+        schedule = self._key_schedule(key)
+        length = os.path.getsize(file_path) - start
+        if length <= 0:
+            return 0
+        if not decrypt:
+            # Validate up front so a bad byte cannot leave the file
+            # half encrypted.
+            with open(file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as file_map:
+                self._check_ascii_map(file_map, chunk_size, start)
+
+        self._transform_file_range(schedule.key, file_path, start, file_path, start, length,
+                                   decrypt, chunk_size, workers, min_parallel_bytes)
+        return length
+
+    def _transform_file_range(self, key, src_path, src_start, dst_path, dst_start, length,
+                              decrypt, chunk_size, workers, min_bytes):
+        if not length:
+            return
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or length < min_bytes:
+            _transform_file_shard(key, src_path, src_start, dst_path, dst_start,
+                                  0, length, decrypt, chunk_size)
+            return
+
+        # Shards write disjoint ranges of the preallocated output, so each
+        # worker maps the files itself and nothing is shipped back.
+        shard_size = -(-length // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_transform_file_shard, key, src_path, src_start,
+                                   dst_path, dst_start, pos, min(shard_size, length - pos),
+                                   decrypt, chunk_size)
+                       for pos in range(0, length, shard_size)]
+            for future in futures:
+                future.result()
+
+    def decrypt_range(self, source, key, start, length):
+        if start < 0 or length < 0:
+            raise ValueError("Range start and length must not be negative")
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # Raw ciphertext without the file header.
+            schedule = self._key_schedule(key)
+            return bytes(schedule.transform(source[start:start + length], start, decrypt=True))
+
+        with self.open_reader(source, key) as reader:
+            reader.seek(start)
+            return reader.read(length)
+
+    def open_reader(self, source, key):
+        if isinstance(source, (str, os.PathLike)):
+            return SkipjackReader(open(source, 'rb'), self._key_schedule(key), close_source=True)
+        return SkipjackReader(source, self._key_schedule(key))
+
+    @staticmethod
+    def _check_ascii_map(file_map, chunk_size, start=0):
+        for pos in range(start, len(file_map), chunk_size):
+            if not file_map[pos:pos + chunk_size].isascii():
+                raise ValueError("Message must contain only ASCII bytes")
+
+    @staticmethod
+    def _iter_hex_chunks(reader, pending, chunk_size):
+        # Legacy hex files may carry surrounding whitespace, and a chunk
+        # boundary can split a digit pair, so an odd trailing digit is
+        # carried into the next read.
+        while True:
+            data = reader.read(chunk_size * 2)
+            text = pending + b''.join(data.split())
+            if not data:
+                break
+            usable = len(text) - len(text) % 2
+            pending = text[usable:]
+            if usable:
+                yield Skipjack._decode_hex(text[:usable])
+        if text:
+            if len(text) % 2 != 0:
+                raise ValueError("Invalid ciphertext length")
+            yield Skipjack._decode_hex(text)
+
+    @staticmethod
+    def _decode_hex(text):
+        if not set(text) <= _HEX_BYTES:
+            raise ValueError("Ciphertext must be a hex string")
+        return bytes.fromhex(text.decode('ascii'))
+
+    @staticmethod
+    def _as_bytes(data, name):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        if not isinstance(data, (bytes, bytearray)):
+            raise ValueError(f"{name} must be bytes, bytearray or memoryview")
+        if not data:
+            raise ValueError(f"{name} cannot be empty")
+        return data
+
+    @classmethod
+    def pack(cls, ciphertext, encoding="binary"):
+        if encoding == "binary":
+            return cls.BINARY_MAGIC + bytes(ciphertext)
+        if encoding == "hex":
+            return bytes(ciphertext).hex().encode('ascii')
+        raise ValueError(f"Unknown ciphertext encoding: {encoding}")
+
+    @classmethod
+    def unpack(cls, raw):
+        raw = bytes(raw)
+        if raw.startswith(cls.BINARY_MAGIC):
+            return raw[len(cls.BINARY_MAGIC):]
+
+        text = raw.decode('ascii', errors='replace').strip()
+        if not set(text) <= _HEX_DIGITS or len(text) % 2 != 0:
+            raise ValueError("Ciphertext must be Skipjack binary or a hex string")
+        return bytes.fromhex(text)
+
+    @classmethod
+    def save_ciphertext(cls, file_path, ciphertext, encoding="binary"):
+        with open(file_path, 'wb') as f:
+            f.write(cls.pack(ciphertext, encoding))
+
+    @classmethod
+    def load_ciphertext(cls, file_path):
+        with open(file_path, 'rb') as f:
+            return cls.unpack(f.read())
 
     @staticmethod
     def get_key_type():
-        return "skipjack" 
\ No newline at end of file
+        return "skipjack"
+
+
+class SkipjackKeySchedule:
+    # Below this size the per-call NumPy setup costs more than it saves.
+    NUMPY_MIN_BYTES = 4096
+
+    def __init__(self, key):
+        key_bytes = key.encode('ascii')
+        key_len = len(key_bytes)
+        self.key = key
+        # The transform at position i depends only on key[i % key_len] and
+        # i % 256, so the whole schedule repeats every lcm(key_len, 256) bytes.
+        self.period = lcm(key_len, 256)
+        tweaks = bytes((key_bytes[i % key_len] ^ (i % 256)) & 0x7F for i in range(self.period))
+        self.tweaks = tweaks
+        self.forward = [_FORWARD_TABLES[t] for t in tweaks]
+        self.inverse = [_INVERSE_TABLES[t] for t in tweaks]
+
+    def transform(self, data, offset=0, decrypt=False):
+        if np is not None and len(data) >= self.NUMPY_MIN_BYTES:
+            return self._transform_numpy(data, offset, decrypt)
+        return self._transform_python(data, offset, decrypt)
+
+    def _transform_python(self, data, offset, decrypt):
+        tables = self.inverse if decrypt else self.forward
+        period = self.period
+        start = offset % period
+        if len(data) <= period:
+            return bytearray(tables[(start + i) % period][b] for i, b in enumerate(data))
+
+        data = bytes(data)
+        result = bytearray(len(data))
+        for j in range(period):
+            result[j::period] = data[j::period].translate(tables[(start + j) % period])
+        return result
+
+    def _transform_numpy(self, data, offset, decrypt):
+        table = _INVERSE_ARRAY if decrypt else _FORWARD_ARRAY
+        start = offset % self.period
+        values = np.frombuffer(data, dtype=np.uint8)
+        # Rotate the schedule to the starting offset and repeat it over the
+        # buffer, then gather every output byte from the 128x256 table.
+        tweaks = np.frombuffer(self.tweaks, dtype=np.uint8)
+        tweaks = np.resize(np.roll(tweaks, -start), len(values))
+        return table[tweaks, values].tobytes()
+
+
+class SkipjackReader(io.RawIOBase):
+    # Seekable plaintext view of a Skipjack ciphertext file. Each read
+    # decrypts only the requested bytes, since the transform is purely
+    # position dependent.
+    def __init__(self, source, schedule, close_source=False):
+        super().__init__()
+        self._source = source
+        self._schedule = schedule
+        self._close_source = close_source
+        self._pos = 0
+
+        source.seek(0)
+        if source.read(len(Skipjack.BINARY_MAGIC)) == Skipjack.BINARY_MAGIC:
+            self._data_start = len(Skipjack.BINARY_MAGIC)
+            self._width = 1
+            end = source.seek(0, io.SEEK_END)
+        else:
+            # Legacy hex text: two digits per byte, possibly followed by a
+            # trailing newline.
+            self._data_start = 0
+            self._width = 2
+            end = source.seek(0, io.SEEK_END)
+            tail_start = max(0, end - 64)
+            source.seek(tail_start)
+            end = tail_start + len(source.read().rstrip())
+        self._length = (end - self._data_start) // self._width
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._length + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self._length - self._pos)
+        if count <= 0:
+            return 0
+
+        self._source.seek(self._data_start + self._pos * self._width)
+        raw = self._source.read(count * self._width)
+        ciphertext = raw if self._width == 1 else Skipjack._decode_hex(raw)
+        count = len(ciphertext)
+        buffer[:count] = self._schedule.transform(ciphertext, self._pos, decrypt=True)
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed and self._close_source:
+            self._source.close()
+        super().close()
+
+
+def _transform_shard(key, data, offset, decrypt):
+    return bytes(Skipjack()._key_schedule(key).transform(data, offset, decrypt))
+
+
+def _transform_file_shard(key, src_path, src_start, dst_path, dst_start, pos, length,
+                          decrypt, chunk_size):
+    schedule = Skipjack()._key_schedule(key)
+    with open(src_path, 'rb') as src, open(dst_path, 'r+b') as dst, \
+            mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as src_map, \
+            mmap.mmap(dst.fileno(), 0) as dst_map:
+        end = pos + length
+        while pos < end:
+            stop = min(pos + chunk_size, end)
+            dst_map[dst_start + pos:dst_start + stop] = schedule.transform(
+                src_map[src_start + pos:src_start + stop], pos, decrypt)
+            pos = stop
+        dst_map.flush()
+
+
+def _build_tables(ftable):
+    forward = []
+    inverse = []
+    for tweak in range(128):
+        forward.append(bytes(ftable[(b ^ tweak) & 0x7F] for b in range(256)))
+        # Scan from the top so the smallest matching input wins, as the
+        # original linear search did; unmatched bytes map to themselves.
+        table = bytearray(range(256))
+        for i in range(127, -1, -1):
+            table[ftable[(i ^ tweak) & 0x7F]] = i
+        inverse.append(bytes(table))
+    return forward, inverse
+
+
+_HEX_DIGITS = frozenset(string.hexdigits)
+_HEX_BYTES = frozenset(string.hexdigits.encode('ascii'))
+_FORWARD_TABLES, _INVERSE_TABLES = _build_tables(Skipjack.FTABLE)
+if np is not None:
+    _FORWARD_ARRAY = np.frombuffer(b''.join(_FORWARD_TABLES), dtype=np.uint8).reshape(128, 256)
+    _INVERSE_ARRAY = np.frombuffer(b''.join(_INVERSE_TABLES), dtype=np.uint8).reshape(128, 256)